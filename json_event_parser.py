@@ -18,17 +18,18 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import argparse
+import functools
 import re
 import sys
-from enum import Enum
+from enum import Enum, IntEnum
 
 # https://datatracker.ietf.org/doc/html/rfc8259
 
 #########
 # LEXER #
 #########
-from io import TextIOBase
-from typing import Any
+from io import StringIO, TextIOBase
+from typing import Any, Callable, Dict, Optional, Tuple
 
 ESCAPE_SEQUENCES = {
     "\"": "\"",
@@ -60,9 +61,28 @@ class JSONLexError(ValueError):
 
 WHITE_SPACES = " \t\r\n"
 BEGIN_NUMBER = "-0123456789"
-
-
-class LexerState(Enum):
+_BUFFER_SIZE = 65536
+# char classes: a frozenset lookup is a single hash probe
+_WHITE_SPACE_CHARS = frozenset(WHITE_SPACES)
+_DIGIT_CHARS = frozenset("0123456789")
+_NON_ZERO_DIGIT_CHARS = frozenset("123456789")
+_EXP_CHARS = frozenset("eE")
+_EXP_SIGN_CHARS = frozenset("-+")
+_BEGIN_NUMBER_CHARS = frozenset(BEGIN_NUMBER)
+_FRAC_OR_EXP_CHARS = frozenset(".eE")
+# a valid number. Groups: fraction, exponent
+_NUMBER_RE = re.compile(
+    r'-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?')
+_WHITE_SPACES_RE = re.compile(r'[ \t\r\n]*')
+_DIGITS_RE = re.compile(r'[0-9]*')
+_HEX_DIGITS_RE = re.compile(r'[0-9a-fA-F]{4}')
+# a run of chars that need no special handling in a string
+_UNESCAPED_CHARS_RE = re.compile(r'[^"\\\n]*')
+# the end of a string made of such a run
+_SIMPLE_STRING_RE = re.compile(r'[^"\\\n]*"')
+
+
+class LexerState(IntEnum):
     """
     The lexer is a DFA. This is the state of the lexer.
     """
@@ -72,7 +92,7 @@ class LexerState(Enum):
     STRING = 5
 
 
-class LexerSubState(Enum):
+class LexerSubState(IntEnum):
     NONE = 0
 
     NEG_NUMBER_START = 10
@@ -82,11 +102,14 @@ class LexerSubState(Enum):
     NUMBER_FRAC = 22
     NUMBER_FRAC_EXP_START = 31
     NUMBER_FRAC_EXP = 32
+    NUMBER_FRAC_EXP_SIGN_START = 41  # after `e-` or `e+`
+    NUMBER_FRAC_EXP_SIGN = 42
+    # the former names, kept for compatibility
     NUMBER_FRAC_EXP_MINUS_START = 41
     NUMBER_FRAC_EXP_MINUS = 42
 
     ESCAPE = 50
-    UNICODE = 51
+    UNICODE = 51  # unused: kept for compatibility
 
 
 class LexerToken(Enum):
@@ -108,6 +131,38 @@ class LexerToken(Enum):
     VALUE_SEPARATOR = 21
 
 
+# at the end of the source, the token of a complete number or the error of an
+# incomplete number, by sub state
+_COMPLETE_NUMBER_TOKENS = {
+    LexerSubState.ZERO_NUMBER_START: LexerToken.INT_VALUE,
+    LexerSubState.OTHER_NUMBER: LexerToken.INT_VALUE,
+    LexerSubState.NUMBER_FRAC: LexerToken.FLOAT_VALUE,
+    LexerSubState.NUMBER_FRAC_EXP: LexerToken.FLOAT_VALUE,
+    LexerSubState.NUMBER_FRAC_EXP_SIGN: LexerToken.FLOAT_VALUE,
+}
+_INCOMPLETE_NUMBER_ERRORS = {
+    LexerSubState.NEG_NUMBER_START: "Missing digits `{}`",
+    LexerSubState.NUMBER_FRAC_START: "Missing decimals `{}`",
+    LexerSubState.NUMBER_FRAC_EXP_START: "Missing exp `{}`",
+    LexerSubState.NUMBER_FRAC_EXP_SIGN_START: "Missing exp `{}`",
+}
+
+# begin-object, end-object, begin-array, end-array, name-separator and
+# value-separator are dispatched with a single lookup. The tokens without a
+# value are built once for all.
+_STRUCTURAL_TOKENS = {
+    "{": (LexerToken.BEGIN_OBJECT, None),
+    "}": (LexerToken.END_OBJECT, None),
+    "[": (LexerToken.BEGIN_ARRAY, None),
+    "]": (LexerToken.END_ARRAY, None),
+    ":": (LexerToken.NAME_SEPARATOR, None),
+    ",": (LexerToken.VALUE_SEPARATOR, None),
+}
+_FALSE_TOKEN = (LexerToken.BOOLEAN_VALUE, False)
+_TRUE_TOKEN = (LexerToken.BOOLEAN_VALUE, True)
+_NULL_TOKEN = (LexerToken.NULL_VALUE, None)
+
+
 class JSONLexer:
     """
     A JSONLexer. Uses a `state` and a `sub_state`.
@@ -116,298 +171,451 @@ class JSONLexer:
     def __init__(self, source: TextIOBase, ignore_unicode_errors: bool = True):
         self._source = source
         self._ignore_unicode_errors = ignore_unicode_errors
-        self.line = 0
-        self.column = 0
+        self._tokens = None
+        # the line and the column are computed from the current block and
+        # the position of the last token, only when they are needed
+        self._chars = ""
+        self._pos = 0
+        self._line_base = 0
+        self._column_base = 0
+        # the last computed position: the next computation starts there
+        self._last_pos = 0
+        self._last_line = 0
+        self._last_new_line = -1
+
+    @classmethod
+    def from_bytes(cls, data: bytes, encoding: str = "utf-8",
+                   ignore_unicode_errors: bool = True) -> "JSONLexer":
+        """
+        Create a lexer for a JSON document that is already in memory. The
+        document is decoded once, not block by block.
+
+        >>> list(JSONLexer.from_bytes(b'[1]'))[1]
+        (<LexerToken.INT_VALUE: 4>, '1')
+
+        :param data: the document (bytes, bytearray or memoryview)
+        :param encoding: the encoding of the document
+        :param ignore_unicode_errors: if True, replace the invalid surrogates
+        by U+FFFD instead of raising an error
+        :return: the lexer
+        """
+        return cls(StringIO(str(data, encoding)), ignore_unicode_errors)
+
+    def next_token(self) -> Optional[Tuple[LexerToken, Any]]:
+        """
+        Pull the next token. The DFA stays a generator: resuming it is
+        cheaper than restoring its state from attributes at each call.
+
+        :return: the next token, or None at the end of the source
+        """
+        return next(iter(self), None)
 
     def __iter__(self):
-        state = LexerState.NONE
+        """
+        The tokens. `next_token()` and the iteration share the same
+        generator: they can be mixed.
+        """
+        if self._tokens is None:
+            self._tokens = self._lex()
+        return self._tokens
+
+    @property
+    def line(self) -> int:
+        """
+        :return: the line of the last token (or error)
+        """
+        self._update_position()
+        return self._last_line
+
+    @property
+    def column(self) -> int:
+        """
+        :return: the column of the end of the last token (or error)
+        """
+        self._update_position()
+        if self._last_new_line == -1:
+            return self._column_base + self._pos
+        else:
+            return self._pos - self._last_new_line - 1
+
+    def _update_position(self):
+        """
+        Count the new lines between the last computed position and the
+        current one: reading the position after each token stays linear.
+        """
+        pos = self._pos
+        if pos < self._last_pos:  # a char was ungot: restart from the block
+            self._last_pos = 0
+            self._last_line = self._line_base
+            self._last_new_line = -1
+        new_lines = self._chars.count("\n", self._last_pos, pos)
+        if new_lines:
+            self._last_line += new_lines
+            self._last_new_line = self._chars.rfind("\n", self._last_pos, pos)
+        self._last_pos = pos
+
+    def _lex(self):
+        # local names are faster than enum attributes on the hot path
+        NONE, NUMBER, STRING = (
+            LexerState.NONE, LexerState.NUMBER, LexerState.STRING)
+        SUB_NONE = LexerSubState.NONE
+        NEG_NUMBER_START = LexerSubState.NEG_NUMBER_START
+        ZERO_NUMBER_START = LexerSubState.ZERO_NUMBER_START
+        OTHER_NUMBER = LexerSubState.OTHER_NUMBER
+        NUMBER_FRAC_START = LexerSubState.NUMBER_FRAC_START
+        NUMBER_FRAC = LexerSubState.NUMBER_FRAC
+        NUMBER_FRAC_EXP_START = LexerSubState.NUMBER_FRAC_EXP_START
+        NUMBER_FRAC_EXP = LexerSubState.NUMBER_FRAC_EXP
+        NUMBER_FRAC_EXP_SIGN_START = LexerSubState.NUMBER_FRAC_EXP_SIGN_START
+        NUMBER_FRAC_EXP_SIGN = LexerSubState.NUMBER_FRAC_EXP_SIGN
+        ESCAPE = LexerSubState.ESCAPE
+        INT_VALUE, FLOAT_VALUE = LexerToken.INT_VALUE, LexerToken.FLOAT_VALUE
+        STRING_TOKEN = LexerToken.STRING
+        false_token, true_token, null_token = (
+            _FALSE_TOKEN, _TRUE_TOKEN, _NULL_TOKEN)
+        white_space_chars = _WHITE_SPACE_CHARS
+        digit_chars = _DIGIT_CHARS
+        non_zero_digit_chars = _NON_ZERO_DIGIT_CHARS
+        exp_chars = _EXP_CHARS
+        exp_sign_chars = _EXP_SIGN_CHARS
+        begin_number_chars = _BEGIN_NUMBER_CHARS
+        frac_or_exp_chars = _FRAC_OR_EXP_CHARS
+        structural_tokens = _STRUCTURAL_TOKENS
+
+        state = NONE
         sub_state = None
         buf = None
-        unicode_index = 0
-        code_point = 0
         high = 0
-        unget = None  # a one place buffer to `unget` char
+        chars = ""  # the current block of the source
+        pos = 0
+        length = 0
         while True:
-            if unget:
-                next_char = unget
-                unget = None
-            else:
-                next_char = self._source.read(1)
-            if not next_char:  # end of the source
-                if state == LexerState.NUMBER:  # finish our number if possible
-                    if sub_state == LexerSubState.ZERO_NUMBER_START:
-                        yield LexerToken.INT_VALUE, "0"
-                    elif sub_state == LexerSubState.NEG_NUMBER_START:
-                        self._lex_error("Missing digits `{}`", buf)
-                    elif sub_state == LexerSubState.OTHER_NUMBER:
-                        yield LexerToken.INT_VALUE, buf
-                    elif sub_state == LexerSubState.NUMBER_FRAC_START:
-                        self._lex_error("Missing decimals `{}`", buf)
-                    elif sub_state == LexerSubState.NUMBER_FRAC:
-                        yield LexerToken.FLOAT_VALUE, buf
-                    elif sub_state == LexerSubState.NUMBER_FRAC_EXP_START:
-                        self._lex_error("Missing exp `{}`", buf)
-                    elif sub_state == LexerSubState.NUMBER_FRAC_EXP:
-                        yield LexerToken.FLOAT_VALUE, buf
-                    elif (sub_state
-                          == LexerSubState.NUMBER_FRAC_EXP_MINUS_START):
-                        self._lex_error("Missing exp `{}`", buf)
-                    elif sub_state == LexerSubState.NUMBER_FRAC_EXP_MINUS:
-                        yield LexerToken.FLOAT_VALUE, buf
-                elif state == LexerState.STRING:  # unfinished string
-                    self._lex_error("Missing end quote `{}`", buf)
+            if pos >= length:
+                chars = self._next_block(chars)
+                pos = 0
+                length = len(chars)
+            if length:
+                next_char = chars[pos]
+                pos += 1
+            else:  # end of the source
+                if state == NUMBER:  # finish our number if possible
+                    token = _COMPLETE_NUMBER_TOKENS.get(sub_state)
+                    if token is None:
+                        self._lex_error(
+                            pos, _INCOMPLETE_NUMBER_ERRORS[sub_state], buf)
+                    self._pos = pos
+                    yield token, buf
+                elif state == STRING:  # unfinished string
+                    self._lex_error(
+                        pos, "Missing end quote `{}`", "".join(buf))
                 return
 
-            self.column += 1
-            if next_char == "\n":
-                self.line += 1
-                self.column = 0
-            elif state == LexerState.NONE:  # out of objects and arrays
-                if next_char in WHITE_SPACES:
-                    pass
+            if state == NONE:  # out of objects and arrays
+                token = structural_tokens.get(next_char)
+                if token is not None:  # {}[]:,
+                    self._pos = pos
+                    yield token
+                elif next_char == '"':  # begin string
+                    match = _SIMPLE_STRING_RE.match(chars, pos)
+                    if match:  # no escape: the string is a slice of the block
+                        end = match.end()
+                        self._pos = end
+                        yield STRING_TOKEN, chars[pos:end - 1]
+                        pos = end
+                    else:
+                        state = STRING
+                        sub_state = SUB_NONE
+                        buf = []
+                elif next_char in white_space_chars:  # skip the whole run
+                    pos = _WHITE_SPACES_RE.match(chars, pos).end()
+                elif next_char in begin_number_chars:
+                    match = _NUMBER_RE.match(chars, pos - 1)
+                    if (match and match.end() < length
+                            and chars[match.end()] not in frac_or_exp_chars):
+                        # the whole number is in the block: no need for the DFA
+                        end = match.end()
+                        pos = end
+                        if match.lastindex is None:
+                            self._pos = pos
+                            yield INT_VALUE, match.group()
+                        else:
+                            self._pos = pos
+                            yield FLOAT_VALUE, match.group().replace("E", "e")
+                    elif next_char == "-":  # number (negative)
+                        state = NUMBER
+                        sub_state = NEG_NUMBER_START
+                        buf = "-"
+                    elif next_char == "0":  # number (0 or 0.)
+                        state = NUMBER
+                        sub_state = ZERO_NUMBER_START
+                        buf = "0"
+                    else:  # other number
+                        state = NUMBER
+                        sub_state = OTHER_NUMBER
+                        buf = next_char
                 elif next_char == "f":  # value : false
-                    if self._source.read(4) != "alse":
-                        self._lex_error("Expected `false`")
-                    yield LexerToken.BOOLEAN_VALUE, False
+                    if chars.startswith("alse", pos):
+                        pos += 4
+                    else:  # the end of the block, or an error
+                        word, chars, pos = self._read(chars, pos, 4)
+                        length = len(chars)
+                        if word != "alse":
+                            self._lex_error(pos, "Expected `false`")
+                    self._pos = pos
+                    yield false_token
                 elif next_char == "t":  # value : true
-                    if self._source.read(3) != "rue":
-                        self._lex_error("Expected `true`")
-                    yield LexerToken.BOOLEAN_VALUE, True
+                    if chars.startswith("rue", pos):
+                        pos += 3
+                    else:  # the end of the block, or an error
+                        word, chars, pos = self._read(chars, pos, 3)
+                        length = len(chars)
+                        if word != "rue":
+                            self._lex_error(pos, "Expected `true`")
+                    self._pos = pos
+                    yield true_token
                 elif next_char == "n":  # value : null
-                    if self._source.read(3) != "ull":
-                        self._lex_error("Expected `null`")
-                    yield LexerToken.NULL_VALUE, None
-                elif next_char == "{":  # begin-object
-                    yield LexerToken.BEGIN_OBJECT, None
-                elif next_char == "}":  # end-object
-                    yield LexerToken.END_OBJECT, None
-                elif next_char == "[":  # begin-array
-                    yield LexerToken.BEGIN_ARRAY, None
-                elif next_char == "]":  # end-array
-                    yield LexerToken.END_ARRAY, None
-                elif next_char == ":":  # name-separator
-                    yield LexerToken.NAME_SEPARATOR, None
-                elif next_char == ",":  # value-separator
-                    yield LexerToken.VALUE_SEPARATOR, None
-                elif next_char in "-":  # number (negative)
-                    state = LexerState.NUMBER
-                    sub_state = LexerSubState.NEG_NUMBER_START
-                    buf = "-"
-                elif next_char == "0":  # number (0 or 0.)
-                    state = LexerState.NUMBER
-                    sub_state = LexerSubState.ZERO_NUMBER_START
-                    buf = "0"
-                elif next_char in "123456789":  # other number
-                    state = LexerState.NUMBER
-                    sub_state = LexerSubState.OTHER_NUMBER
-                    buf = next_char
-                elif next_char == '"':  # begin string
-                    state = LexerState.STRING
-                    sub_state = LexerSubState.NONE
-                    buf = ""
+                    if chars.startswith("ull", pos):
+                        pos += 3
+                    else:  # the end of the block, or an error
+                        word, chars, pos = self._read(chars, pos, 3)
+                        length = len(chars)
+                        if word != "ull":
+                            self._lex_error(pos, "Expected `null`")
+                    self._pos = pos
+                    yield null_token
                 else:
-                    self._lex_error("Unexpected char `{}`", next_char)
-            elif state == LexerState.NUMBER:  # 6. Numbers
-                if sub_state == LexerSubState.NEG_NUMBER_START:
+                    self._lex_error(pos, "Unexpected char `{}`", next_char)
+            elif state == NUMBER:  # 6. Numbers
+                if sub_state == NEG_NUMBER_START:
                     if next_char == "0":
-                        sub_state = LexerSubState.ZERO_NUMBER_START
+                        sub_state = ZERO_NUMBER_START
                         buf += "0"
-                    elif next_char in "123456789":
+                    elif next_char in non_zero_digit_chars:
                         buf += next_char
-                        sub_state = LexerSubState.OTHER_NUMBER
+                        sub_state = OTHER_NUMBER
                     else:
-                        self._lex_error("Expected digit, got `{}`", next_char)
-                elif sub_state == LexerSubState.ZERO_NUMBER_START:  # -0 or 0
+                        self._lex_error(
+                            pos, "Expected digit, got `{}`", next_char)
+                elif sub_state == ZERO_NUMBER_START:  # -0 or 0
                     if next_char == ".":
-                        sub_state = LexerSubState.NUMBER_FRAC_START
+                        sub_state = NUMBER_FRAC_START
                         buf += "."
-                    elif next_char == "e" or next_char == "E":
-                        sub_state = LexerSubState.NUMBER_FRAC_EXP_START
+                    elif next_char in exp_chars:
+                        sub_state = NUMBER_FRAC_EXP_START
                         buf += "e"
                     else:
-                        yield LexerToken.INT_VALUE, "0"
+                        pos -= 1  # `unget` char
+                        self._pos = pos
+                        yield INT_VALUE, buf
                         buf = None
-                        unget = next_char
-                        state = LexerState.NONE
-                        sub_state = LexerSubState.NONE
-                elif sub_state == LexerSubState.OTHER_NUMBER:  # -[1-9]or [1-9]
+                        state = NONE
+                        sub_state = SUB_NONE
+                elif sub_state == OTHER_NUMBER:  # -[1-9]or [1-9]
                     if next_char == ".":
-                        sub_state = LexerSubState.NUMBER_FRAC_START
+                        sub_state = NUMBER_FRAC_START
                         buf += "."
-                    elif next_char in "0123456789":
-                        buf += next_char
-                    elif next_char in "eE":
+                    elif next_char in digit_chars:
+                        end = _DIGITS_RE.match(chars, pos).end()
+                        buf += chars[pos - 1:end]
+                        pos = end
+                    elif next_char in exp_chars:
                         buf += 'e'
-                        sub_state = LexerSubState.NUMBER_FRAC_EXP_START
+                        sub_state = NUMBER_FRAC_EXP_START
                     else:
-                        yield LexerToken.INT_VALUE, buf
+                        pos -= 1  # `unget` char
+                        self._pos = pos
+                        yield INT_VALUE, buf
                         buf = None
-                        unget = next_char
-                        state = LexerState.NONE
-                        sub_state = LexerSubState.NONE
-                elif sub_state == LexerSubState.NUMBER_FRAC_START:
-                    if next_char in "0123456789":
-                        buf += next_char
-                        sub_state = LexerSubState.NUMBER_FRAC
+                        state = NONE
+                        sub_state = SUB_NONE
+                elif sub_state == NUMBER_FRAC_START:
+                    if next_char in digit_chars:
+                        end = _DIGITS_RE.match(chars, pos).end()
+                        buf += chars[pos - 1:end]
+                        pos = end
+                        sub_state = NUMBER_FRAC
                     else:
-                        self._lex_error("Missing decimals `{}`", buf)
-                elif sub_state == LexerSubState.NUMBER_FRAC:
-                    if next_char == "e" or next_char == "E":
-                        sub_state = LexerSubState.NUMBER_FRAC_EXP_START
+                        self._lex_error(pos, "Missing decimals `{}`", buf)
+                elif sub_state == NUMBER_FRAC:
+                    if next_char in exp_chars:
+                        sub_state = NUMBER_FRAC_EXP_START
                         buf += "e"
-                    elif next_char in "0123456789":
-                        buf += next_char
+                    elif next_char in digit_chars:
+                        end = _DIGITS_RE.match(chars, pos).end()
+                        buf += chars[pos - 1:end]
+                        pos = end
                     else:
-                        yield LexerToken.FLOAT_VALUE, buf
+                        pos -= 1  # `unget` char
+                        self._pos = pos
+                        yield FLOAT_VALUE, buf
                         buf = None
-                        unget = next_char
-                        state = LexerState.NONE
-                        sub_state = LexerSubState.NONE
-                elif sub_state == LexerSubState.NUMBER_FRAC_EXP_START:
-                    if next_char == "-":
-                        sub_state = LexerSubState.NUMBER_FRAC_EXP_MINUS_START
-                        buf += "-"
-                    elif next_char in "0123456789":
+                        state = NONE
+                        sub_state = SUB_NONE
+                elif sub_state == NUMBER_FRAC_EXP_START:
+                    if next_char in exp_sign_chars:
+                        sub_state = NUMBER_FRAC_EXP_SIGN_START
                         buf += next_char
-                        sub_state = LexerSubState.NUMBER_FRAC_EXP
+                    elif next_char in digit_chars:
+                        end = _DIGITS_RE.match(chars, pos).end()
+                        buf += chars[pos - 1:end]
+                        pos = end
+                        sub_state = NUMBER_FRAC_EXP
                     else:
-                        self._lex_error("Missing exp `{}`", buf)
-                elif sub_state == LexerSubState.NUMBER_FRAC_EXP:
-                    if next_char in "0123456789":
-                        buf += next_char
+                        self._lex_error(pos, "Missing exp `{}`", buf)
+                elif sub_state == NUMBER_FRAC_EXP:
+                    if next_char in digit_chars:
+                        end = _DIGITS_RE.match(chars, pos).end()
+                        buf += chars[pos - 1:end]
+                        pos = end
                     else:
-                        yield LexerToken.FLOAT_VALUE, buf
+                        pos -= 1  # `unget` char
+                        self._pos = pos
+                        yield FLOAT_VALUE, buf
                         buf = None
-                        unget = next_char
-                        state = LexerState.NONE
-                        sub_state = LexerSubState.NONE
-                elif sub_state == LexerSubState.NUMBER_FRAC_EXP_MINUS_START:
-                    if next_char in "0123456789":
-                        buf += next_char
-                        sub_state = LexerSubState.NUMBER_FRAC_EXP_MINUS
+                        state = NONE
+                        sub_state = SUB_NONE
+                elif sub_state == NUMBER_FRAC_EXP_SIGN_START:
+                    if next_char in digit_chars:
+                        end = _DIGITS_RE.match(chars, pos).end()
+                        buf += chars[pos - 1:end]
+                        pos = end
+                        sub_state = NUMBER_FRAC_EXP_SIGN
                     else:
-                        self._lex_error("Missing exp `{}`", buf)
-                elif sub_state == LexerSubState.NUMBER_FRAC_EXP_MINUS:
-                    if next_char in "0123456789":
-                        buf += next_char
+                        self._lex_error(pos, "Missing exp `{}`", buf)
+                elif sub_state == NUMBER_FRAC_EXP_SIGN:
+                    if next_char in digit_chars:
+                        end = _DIGITS_RE.match(chars, pos).end()
+                        buf += chars[pos - 1:end]
+                        pos = end
                     else:
-                        yield LexerToken.FLOAT_VALUE, buf
+                        pos -= 1  # `unget` char
+                        self._pos = pos
+                        yield FLOAT_VALUE, buf
                         buf = None
-                        unget = next_char
-                        state = LexerState.NONE
-                        sub_state = LexerSubState.NONE
+                        state = NONE
+                        sub_state = SUB_NONE
                 else:
-                    self._lex_error("Unexpected number state {}".format(
+                    self._lex_error(pos, "Unexpected number state {}".format(
                         sub_state))
-            elif state == LexerState.STRING:  # 7. Strings
-                if high == 0:
-                    if sub_state == LexerSubState.ESCAPE:
-                        try:
-                            c = ESCAPE_SEQUENCES[next_char]
-                        except KeyError:
-                            if next_char == "u":
-                                sub_state = LexerSubState.UNICODE
-                                unicode_index = 0
-                                code_point = 0
-                            else:
-                                self._lex_error(
-                                    "Unknown escaped char: `{}`", next_char)
-                        else:
-                            buf += c
-                            sub_state = LexerSubState.NONE
-                    elif sub_state == LexerSubState.UNICODE:
-                        if unicode_index <= 3:
-                            n = int(next_char, 16)
-                            code_point = code_point * 16 + n
-                            unicode_index += 1
-                        if unicode_index == 4:
-                            try:
-                                # high surrogate
-                                if 0xd800 <= code_point <= 0xdbff:
-                                    high = code_point
-                                # low surrogate
-                                elif 0xdc00 <= code_point <= 0xdfff:
-                                    if self._ignore_unicode_errors:
-                                        buf += chr(0xfffd)
-                                    else:
-                                        raise ValueError()
-                                else:
-                                    buf += chr(code_point)
-                            except ValueError as e:
+            elif next_char != "\n":  # 7. Strings (skip the new lines)
+                if sub_state == ESCAPE:
+                    if next_char == "u":
+                        hex_digits, chars, pos = self._read(chars, pos, 4)
+                        length = len(chars)
+                        if not _HEX_DIGITS_RE.fullmatch(hex_digits):
+                            self._lex_error(
+                                pos, "Expected 4 hex digits, got: `{}`",
+                                hex_digits)
+                        code_point = int(hex_digits, 16)
+                        if high == 0:
+                            # high surrogate
+                            if 0xd800 <= code_point <= 0xdbff:
+                                high = code_point
+                            # low surrogate
+                            elif 0xdc00 <= code_point <= 0xdfff:
                                 if self._ignore_unicode_errors:
-                                    buf += chr(0xfffd)
+                                    buf.append(chr(0xfffd))
                                 else:
-                                    raise e
-                            unicode_index = 0
-                            code_point = 0
-                            sub_state = LexerSubState.NONE
-                    elif next_char == '\\':
-                        sub_state = LexerSubState.ESCAPE
-                    else:
-                        if next_char == '"':  # end of string
-                            state = LexerState.NONE
-                            yield LexerToken.STRING, buf
-                            buf = ""
-                        else:  # unescaped
-                            buf += next_char
-                else:
-                    if sub_state == LexerSubState.ESCAPE:
-                        if next_char == "u":
-                            sub_state = LexerSubState.UNICODE
-                            unicode_index = 0
-                            code_point = 0
+                                    self._lex_error(
+                                        pos, "Unexpected low surrogate: `{}`",
+                                        code_point)
+                            else:
+                                buf.append(chr(code_point))
                         else:
-                            if self._ignore_unicode_errors:
-                                high = 0
-                                unicode_index = 0
-                                code_point = 0
-                                sub_state = LexerSubState.NONE
-                                buf += chr(0xfffd)
+                            # low surrogate
+                            if 0xdc00 <= code_point <= 0xdfff:
+                                buf.append(chr(
+                                    0x10000 + (high - 0xd800) * 0x400
+                                    + code_point - 0xdc00))
+                            elif self._ignore_unicode_errors:
+                                buf.append(chr(0xfffd))
                             else:
                                 self._lex_error(
-                                    "Waiting for unicode \\u, got: `{}`",
-                                    next_char)
-                    elif sub_state == LexerSubState.UNICODE:
-                        if unicode_index <= 3:
-                            n = int(next_char, 16)
-                            code_point = code_point * 16 + n
-                            unicode_index += 1
-                        if unicode_index == 4:
-                            try:
-                                # low surrogate
-                                if 0xdc00 <= code_point <= 0xdfff:
-                                    code_point = (0x10000 + (
-                                            high - 0xd800) * 0x400
-                                                  + code_point - 0xdc00)
-                                    buf += chr(code_point)
-                                else:
-                                    self._lex_error(
-                                        "Waiting for low surrogate, got: `{}`",
-                                        code_point)
-                            except ValueError as e:
-                                if self._ignore_unicode_errors:
-                                    buf += chr(0xfffd)
-                                else:
-                                    raise e
-                            high = 0
-                            unicode_index = 0
-                            code_point = 0
-                            sub_state = LexerSubState.NONE
-                    elif next_char == '\\':
-                        sub_state = LexerSubState.ESCAPE
-                    else:
-                        unget = next_char
-                        if self._ignore_unicode_errors:
-                            buf += chr(0xfffd)
+                                    pos,
+                                    "Waiting for low surrogate, got: `{}`",
+                                    code_point)
                             high = 0
-                            unicode_index = 0
-                            code_point = 0
-                            sub_state = LexerSubState.NONE
-                        else:
+                        sub_state = SUB_NONE
+                    elif high == 0:
+                        try:
+                            buf.append(ESCAPE_SEQUENCES[next_char])
+                        except KeyError:
                             self._lex_error(
-                                "Waiting for backslash, got : `{}`", next_char)
-
-    def _lex_error(self, msg, *parameters):
+                                pos, "Unknown escaped char: `{}`", next_char)
+                        sub_state = SUB_NONE
+                    elif self._ignore_unicode_errors:
+                        high = 0
+                        sub_state = SUB_NONE
+                        buf.append(chr(0xfffd))
+                    else:
+                        self._lex_error(
+                            pos, "Waiting for unicode \\u, got: `{}`",
+                            next_char)
+                elif next_char == '\\':
+                    sub_state = ESCAPE
+                elif high:  # the low surrogate is missing
+                    if self._ignore_unicode_errors:
+                        pos -= 1  # `unget` char
+                        buf.append(chr(0xfffd))
+                        high = 0
+                    else:
+                        self._lex_error(
+                            pos, "Waiting for backslash, got : `{}`",
+                            next_char)
+                elif next_char == '"':  # end of string
+                    state = NONE
+                    self._pos = pos
+                    yield STRING_TOKEN, "".join(buf)
+                    buf = None
+                else:  # unescaped: take the whole run at once
+                    end = _UNESCAPED_CHARS_RE.match(chars, pos).end()
+                    buf.append(chars[pos - 1:end])
+                    pos = end
+
+    def _read(self, chars: str, pos: int, n: int) -> Tuple[str, str, int]:
+        """
+        Read at most `n` chars from the current block, reading the next blocks
+        of the source if necessary.
+
+        :param chars: the current block
+        :param pos: the position in the current block
+        :param n: the number of chars to read
+        :return: the chars read, the new current block and the new position
+        """
+        word = chars[pos:pos + n]
+        pos += len(word)
+        while len(word) < n:
+            chars = self._next_block(chars)
+            if not chars:
+                pos = 0
+                break
+            more = chars[:n - len(word)]
+            pos = len(more)
+            word += more
+        return word, chars, pos
+
+    def _next_block(self, chars: str) -> str:
+        """
+        Read the next block of the source.
+
+        :param chars: the current block, that is entirely consumed
+        :return: the next block
+        """
+        new_lines = chars.count("\n")
+        if new_lines:
+            self._line_base += new_lines
+            self._column_base = len(chars) - chars.rfind("\n") - 1
+        else:
+            self._column_base += len(chars)
+        self._chars = self._source.read(_BUFFER_SIZE)
+        self._pos = 0
+        self._last_pos = 0
+        self._last_line = self._line_base
+        self._last_new_line = -1
+        return self._chars
+
+    def _lex_error(self, pos: int, msg, *parameters):
+        self._pos = pos
         if parameters:
             msg = msg.format(*parameters)
         raise JSONLexError(msg, self.line, self.column)
@@ -447,100 +655,116 @@ class ParserToken(Enum):
     KEY = 100
 
 
+# the tokens of a scalar value. A prebuilt tuple is the fastest container
+# for a membership test of enum members
+_VALUE_TOKENS = (LexerToken.BOOLEAN_VALUE, LexerToken.NULL_VALUE,
+                 LexerToken.INT_VALUE, LexerToken.FLOAT_VALUE,
+                 LexerToken.STRING)
+
+
 class JSONParser:
     def __init__(self, source: TextIOBase):
         self._lex_json = JSONLexer(source)
 
     def __iter__(self):
-        state = ParserState.NONE
+        # local names are faster than enum attributes on the hot path
+        NONE, IN_ARRAY, IN_ARRAY_SEP = (
+            ParserState.NONE, ParserState.IN_ARRAY, ParserState.IN_ARRAY_SEP)
+        IN_OBJECT, IN_OBJECT_MEMBER = (
+            ParserState.IN_OBJECT, ParserState.IN_OBJECT_MEMBER)
+        IN_OBJECT_MEMBER_VALUE = ParserState.IN_OBJECT_MEMBER_VALUE
+        IN_OBJECT_SEP = ParserState.IN_OBJECT_SEP
+        BEGIN_OBJECT, END_OBJECT, BEGIN_ARRAY, END_ARRAY = (
+            LexerToken.BEGIN_OBJECT, LexerToken.END_OBJECT,
+            LexerToken.BEGIN_ARRAY, LexerToken.END_ARRAY)
+        NAME_SEPARATOR = LexerToken.NAME_SEPARATOR
+        VALUE_SEPARATOR = LexerToken.VALUE_SEPARATOR
+        STRING = LexerToken.STRING
+        KEY = ParserToken.KEY
+        value_tokens = _VALUE_TOKENS
+        state = NONE
         states = []
         for t in self._lex_json:
-            if state == ParserState.NONE:
+            kind = t[0]
+            if state == NONE:
                 yield t
-                if t[0] == LexerToken.BEGIN_ARRAY:
+                if kind == BEGIN_ARRAY:
                     states.append(state)
-                    state = ParserState.IN_ARRAY
-                elif t[0] == LexerToken.BEGIN_OBJECT:
+                    state = IN_ARRAY
+                elif kind == BEGIN_OBJECT:
                     states.append(state)
-                    state = ParserState.IN_OBJECT
-                elif t[0] not in (
-                        LexerToken.BOOLEAN_VALUE, LexerToken.NULL_VALUE,
-                        LexerToken.INT_VALUE, LexerToken.FLOAT_VALUE,
-                        LexerToken.STRING):
+                    state = IN_OBJECT
+                elif kind not in value_tokens:
                     self._parse_error("Unexpected token `{}`", t)
-            elif state == ParserState.IN_ARRAY:
-                if t[0] == LexerToken.END_ARRAY:
+            elif state == IN_ARRAY:
+                if kind == END_ARRAY:
                     yield t
                     state = states.pop()
-                elif t[0] in (LexerToken.BOOLEAN_VALUE, LexerToken.NULL_VALUE,
-                              LexerToken.INT_VALUE, LexerToken.FLOAT_VALUE,
-                              LexerToken.STRING):
+                elif kind in value_tokens:
                     yield t
-                    state = ParserState.IN_ARRAY_SEP
-                elif t[0] == LexerToken.BEGIN_ARRAY:
+                    state = IN_ARRAY_SEP
+                elif kind == BEGIN_ARRAY:
                     yield t
-                    states.append(ParserState.IN_ARRAY_SEP)
-                    state = ParserState.IN_ARRAY
-                elif t[0] == LexerToken.BEGIN_OBJECT:
+                    states.append(IN_ARRAY_SEP)
+                    state = IN_ARRAY
+                elif kind == BEGIN_OBJECT:
                     yield t
-                    states.append(ParserState.IN_ARRAY_SEP)
-                    state = ParserState.IN_OBJECT
+                    states.append(IN_ARRAY_SEP)
+                    state = IN_OBJECT
                 else:
                     self._parse_error(
                         "Unexpected token `{}` as array element", t)
-            elif state == ParserState.IN_ARRAY_SEP:
-                if t[0] == LexerToken.END_ARRAY:
+            elif state == IN_ARRAY_SEP:
+                if kind == END_ARRAY:
                     yield t
                     state = states.pop()
-                elif t[0] == LexerToken.VALUE_SEPARATOR:
-                    state = ParserState.IN_ARRAY
+                elif kind == VALUE_SEPARATOR:
+                    state = IN_ARRAY
                 else:
                     self._parse_error(
                         "Unexpected token `{}` in array, expected `{}`", t,
-                        LexerToken.VALUE_SEPARATOR)
-            elif state == ParserState.IN_OBJECT:
-                if t[0] == LexerToken.END_OBJECT:
+                        VALUE_SEPARATOR)
+            elif state == IN_OBJECT:
+                if kind == END_OBJECT:
                     yield t
                     state = states.pop()
-                elif t[0] == LexerToken.STRING:
-                    yield ParserToken.KEY, t[1]
-                    state = ParserState.IN_OBJECT_MEMBER
+                elif kind == STRING:
+                    yield KEY, t[1]
+                    state = IN_OBJECT_MEMBER
                 else:
                     self._parse_error(
                         "Unexpected token `{}` as object member", t)
-            elif state == ParserState.IN_OBJECT_MEMBER:
-                if t[0] == LexerToken.NAME_SEPARATOR:
-                    state = ParserState.IN_OBJECT_MEMBER_VALUE
+            elif state == IN_OBJECT_MEMBER:
+                if kind == NAME_SEPARATOR:
+                    state = IN_OBJECT_MEMBER_VALUE
                 else:
                     self._parse_error("Unexpected token `{}`, expected {}", t,
-                                      LexerToken.NAME_SEPARATOR)
-            elif state == ParserState.IN_OBJECT_MEMBER_VALUE:
-                if t[0] in (LexerToken.BOOLEAN_VALUE, LexerToken.NULL_VALUE,
-                            LexerToken.INT_VALUE, LexerToken.FLOAT_VALUE,
-                            LexerToken.STRING):
+                                      NAME_SEPARATOR)
+            elif state == IN_OBJECT_MEMBER_VALUE:
+                if kind in value_tokens:
                     yield t
-                    state = ParserState.IN_OBJECT_SEP
-                elif t[0] == LexerToken.BEGIN_ARRAY:
+                    state = IN_OBJECT_SEP
+                elif kind == BEGIN_ARRAY:
                     yield t
-                    states.append(ParserState.IN_OBJECT_SEP)
-                    state = ParserState.IN_ARRAY
-                elif t[0] == LexerToken.BEGIN_OBJECT:
+                    states.append(IN_OBJECT_SEP)
+                    state = IN_ARRAY
+                elif kind == BEGIN_OBJECT:
                     yield t
-                    states.append(ParserState.IN_OBJECT_SEP)
-                    state = ParserState.IN_OBJECT
+                    states.append(IN_OBJECT_SEP)
+                    state = IN_OBJECT
                 else:
                     self._parse_error(
                         "Unexpected token `{}` as member value", t)
-            elif state == ParserState.IN_OBJECT_SEP:
-                if t[0] == LexerToken.END_OBJECT:
+            elif state == IN_OBJECT_SEP:
+                if kind == END_OBJECT:
                     yield t
                     state = states.pop()
-                elif t[0] == LexerToken.VALUE_SEPARATOR:
-                    state = ParserState.IN_OBJECT
+                elif kind == VALUE_SEPARATOR:
+                    state = IN_OBJECT
                 else:
                     self._parse_error("Unexpected token `{}` in object", t)
 
-        if state != ParserState.NONE:
+        if state != NONE:
             self._parse_error("End of file (current state = `{}`)", state)
 
     def _parse_error(self, msg: Any, *parameters):
@@ -570,14 +794,27 @@ def _escape_value(value):
     :param value: the value
     :return: the escaped value
     """
-    if re.search(r"[<>&\"']", value):
-        if ']]>' in value:
-            value = value.replace(']]>', ']]]]><![CDATA[>')
-        return "<![CDATA[" + value + "]]>"
+    # five substring searches are faster than a regex or a set operation
+    if ("<" in value or ">" in value or "&" in value or '"' in value
+            or "'" in value):
+        # an f-string builds the result at once
+        return f"<![CDATA[{value.replace(']]>', ']]]]><![CDATA[>')}]]>"
     else:
         return value
 
 
+# https://www.w3.org/TR/2008/REC-xml-20081126/#NT-NameStartChar
+_NAME_START_CHARS = (r':A-Z_a-z\xC0-\xD6\xD8-\xF6\xF8-\u02FF\u0370-\u037D'
+                     r'\u037F-\u1FFF\u200C-\u200D\u2070-\u218F\u2C00-\u2FEF'
+                     r'\u3001-\uD7FF\uF900-\uFDCF\uFDF0-\uFFFD')
+_NAME_CHARS = _NAME_START_CHARS + r'\-.0-9\xB7\u0300-\u036F\u203F-\u2040'
+_NAME_RE = re.compile('[{}][{}]*'.format(_NAME_START_CHARS, _NAME_CHARS))
+_NOT_NAME_START_CHAR_RE = re.compile('[^{}]'.format(_NAME_START_CHARS))
+_NOT_NAME_CHAR_RE = re.compile('[^{}]'.format(_NAME_CHARS))
+
+
+# keys are few and repeated: each one is checked once
+@functools.lru_cache(maxsize=4096)
 def _escape_tag(key):
     """
     >>> _escape_tag("abc")
@@ -592,38 +829,11 @@ def _escape_tag(key):
     """
     if not key:
         return "_"
-
-    c = key[0]
-    if (c in ":_" or 'A' <= c <= 'Z' or 'a' <= c <= 'z'
-            or '\xC0' <= c <= '\xD6' or '\xD8' <= c <= '\xF6'
-            or '\xF8' <= c <= '\u02FF' or '\u0370' <= c <= '\u037D'
-            or '\u037F' <= c <= '\u1FFF' or '\u200C' <= c <= '\u200D'
-            or '\u2070' <= c <= '\u218F' or '\u2C00' <= c <= '\u2FEF'
-            or '\u3001' <= c <= '\uD7FF' or '\uF900' <= c <= '\uFDCF'
-            or '\uFDF0' <= c <= '\uFFFD'):
-        new_chars = None
-    else:
-        new_chars = list(key)
-        new_chars[0] = "_"
-
-    for i in range(1, len(key)):
-        c = key[i]
-        if not (c in ":_-.\xB7" or '0' <= c <= '9' or 'A' <= c <= 'Z'
-                or 'a' <= c <= 'z' or '\xC0' <= c <= '\xD6'
-                or '\xD8' <= c <= '\xF6' or '\xF8' <= c <= '\u036F'
-                or '\u0370' <= c <= '\u037D' or '\u037F' <= c <= '\u1FFF'
-                or '\u200C' <= c <= '\u200D' or '\u203F' <= c <= '\u2040'
-                or '\u2070' <= c <= '\u218F' or '\u2C00' <= c <= '\u2FEF'
-                or '\u3001' <= c <= '\uD7FF' or '\uF900' <= c <= '\uFDCF'
-                or '\uFDF0' <= c <= '\uFFFD'):
-            if new_chars is None:
-                new_chars = list(key)
-            new_chars[i] = "_"
-
-    if new_chars is None:
+    elif _NAME_RE.fullmatch(key):  # most keys are valid names
         return key
     else:
-        return "".join(new_chars)
+        return (_NOT_NAME_START_CHAR_RE.sub("_", key[0])
+                + _NOT_NAME_CHAR_RE.sub("_", key[1:]))
 
 
 class JSONAsXML:
@@ -633,120 +843,147 @@ class JSONAsXML:
         self._source = source
         self._root_tag = root_tag
         self._list_item = list_item
-        self._typed = typed
         self._header = header + "\n"
+        # f-strings are built without parsing a template at each call
         if formatted:
-            self._start_tag = "{0}<{1}>\n"
-            self._end_tag = "{0}</{1}>\n"
-            self._typed_text = """{0}<{1} type="{2}">{3}</{1}>\n"""
-            self._typed_empty = """{0}<{1} type="{2}"/>\n"""
-            self._text = "{0}<{1}>{2}</{1}>\n"
-            self._empty = "{0}<{1}/>\n"
-            self._tabs = [i * "    " for i in range(10)]
+            self._start_tag = lambda sp, k: f"{sp}<{k}>\n"
+            self._end_tag = lambda sp, k: f"{sp}</{k}>\n"
+            self._typed_text = (
+                lambda sp, k, t, v: f'{sp}<{k} type="{t}">{v}</{k}>\n')
+            self._typed_empty = lambda sp, k, t: f'{sp}<{k} type="{t}"/>\n'
+            self._text = lambda sp, k, v: f"{sp}<{k}>{v}</{k}>\n"
+            self._empty = lambda sp, k: f"{sp}<{k}/>\n"
+            self._indent = "    "
         else:
-            self._start_tag = "<{1}>"
-            self._end_tag = "</{1}>"
-            self._typed_text = """<{1} type="{2}">{3}</{1}>"""
-            self._typed_empty = """<{1} type="{2}"/>"""
-            self._text = "<{1}>{2}</{1}>"
-            self._empty = "<{1}/>"
-            self._tabs = [None] * 10
+            self._start_tag = lambda _sp, k: f"<{k}>"
+            self._end_tag = lambda _sp, k: f"</{k}>"
+            self._typed_text = (
+                lambda _sp, k, t, v: f'<{k} type="{t}">{v}</{k}>')
+            self._typed_empty = lambda _sp, k, t: f'<{k} type="{t}"/>'
+            self._text = lambda _sp, k, v: f"<{k}>{v}</{k}>"
+            self._empty = lambda _sp, k: f"<{k}/>"
+            self._indent = ""
+        # enough for most documents, extended if necessary
+        self._tabs = [i * self._indent for i in range(256)]
+        # typed is known once for all: don't test it for every value
+        if typed:
+            self._value_tags = self._typed_value_tags()
+        else:
+            self._value_tags = self._plain_value_tags()
 
     def __iter__(self):
+        # local names are faster than attributes on the hot path
+        value_tags = self._value_tags
+        start_tag = self._start_tag
+        end_tag = self._end_tag
+        tabs = self._tabs
+        list_item = self._list_item
+        BEGIN_OBJECT, BEGIN_ARRAY = (
+            LexerToken.BEGIN_OBJECT, LexerToken.BEGIN_ARRAY)
+        KEY = ParserToken.KEY
+        begin_tokens = (BEGIN_OBJECT, BEGIN_ARRAY)
+        end_tokens = (LexerToken.END_OBJECT, LexerToken.END_ARRAY)
         yield self._header
         tab_count = 0
         spaces = ""
-        yield self._start_tag.format("", self._root_tag)
+        yield self._start_tag("", self._root_tag)
         states_stack = []
         keys_stack = []
-        for t in JSONParser(self._source):
-            token_type = t[0]
-            if (token_type == LexerToken.BEGIN_OBJECT
-                    or token_type == LexerToken.BEGIN_ARRAY):
+        for token_type, value in JSONParser(self._source):
+            if token_type in begin_tokens:
                 if states_stack:  # we have to open parent tag
                     cur_state = states_stack[-1]
-                    if cur_state == LexerToken.BEGIN_ARRAY:
-                        keys_stack.append(self._list_item)
+                    if cur_state == BEGIN_ARRAY:
+                        keys_stack.append(list_item)
                         # if cur_state == LexerToken.BEGIN_OBJECT, was added
                         # by key
                     cur_key = keys_stack[-1]
-                    yield self._start_tag.format(spaces, cur_key)
+                    yield start_tag(spaces, cur_key)
                 tab_count += 1
-                lt = len(self._tabs)
-                if tab_count == lt:
-                    if self._tabs[0] is None:
-                        self._tabs.extend(self._tabs)
-                    else:
-                        self._tabs.extend(
-                            [i * "    " for i in range(lt, 2 * lt)])
-                spaces = self._tabs[tab_count]
+                try:
+                    spaces = tabs[tab_count]
+                except IndexError:
+                    tabs.append(tab_count * self._indent)
+                    spaces = tabs[tab_count]
                 states_stack.append(token_type)
-            elif (token_type == LexerToken.END_OBJECT
-                  or token_type == LexerToken.END_ARRAY):
+            elif token_type in end_tokens:
                 states_stack.pop()
                 if states_stack:  # we have to close parent tag
                     previous_key = keys_stack.pop()
                     tab_count -= 1
-                    spaces = self._tabs[tab_count]
-                    yield self._end_tag.format(spaces, previous_key)
-            elif token_type == ParserToken.KEY:
-                assert states_stack[-1] == LexerToken.BEGIN_OBJECT
-                key = _escape_tag(t[1])
+                    spaces = tabs[tab_count]
+                    yield end_tag(spaces, previous_key)
+            elif token_type == KEY:
+                assert states_stack[-1] == BEGIN_OBJECT
+                key = _escape_tag(value)
                 keys_stack.append(key)
             else:  # a value
                 cur_state = states_stack[-1]
-                if cur_state == LexerToken.BEGIN_ARRAY:
-                    keys_stack.append(self._list_item)
+                if cur_state == BEGIN_ARRAY:
+                    keys_stack.append(list_item)
                     # if cur_state == LexerToken.BEGIN_OBJECT, was added
                     # by key
                 cur_key = keys_stack.pop()
-                value = t[1]
-                if token_type == LexerToken.STRING:
-                    if self._typed:
-                        value_type = "string"
-                        if value:
-                            value = _escape_value(value)
-                            yield self._typed_text.format(
-                                spaces, cur_key, value_type, value)
-                        else:
-                            yield self._typed_empty.format(
-                                spaces, cur_key, value_type)
-                    else:
-                        if value:
-                            value = _escape_value(value)
-                            yield self._text.format(spaces, cur_key, value)
-                        else:
-                            yield self._empty.format(spaces, cur_key)
-                elif token_type == LexerToken.BOOLEAN_VALUE:
-                    value = "true" if value else "false"
-                    if self._typed:
-                        value_type = "boolean"
-                        yield self._typed_text.format(
-                            spaces, cur_key, value_type, value)
-                    else:
-                        yield self._text.format(spaces, cur_key, value)
-                elif token_type == LexerToken.NULL_VALUE:
-                    value = "null"
-                    if self._typed:
-                        value_type = "null"
-                        yield self._typed_text.format(
-                            spaces, cur_key, value_type, value)
-                    else:
-                        yield self._text.format(spaces, cur_key, value)
-                else:
-                    if self._typed:
-                        if token_type == LexerToken.INT_VALUE:
-                            value_type = "int"
-                        elif token_type == LexerToken.FLOAT_VALUE:
-                            value_type = "float"
-                        else:
-                            raise Exception("Token type " + token_type)
-                        yield self._typed_text.format(
-                            spaces, cur_key, value_type, value)
-                    else:
-                        yield self._text.format(spaces, cur_key, value)
-
-        yield self._end_tag.format("", self._root_tag)
+                yield value_tags[token_type](spaces, cur_key, value)
+
+        yield self._end_tag("", self._root_tag)
+
+    def write_to(self, dest: TextIOBase, lines_per_write: int = 1024):
+        """
+        Write the XML to `dest`. This is the fast path: the lines are
+        joined and written by batches, not one by one.
+
+        :param dest: the destination
+        :param lines_per_write: the number of lines of a batch
+        """
+        lines = []
+        try:
+            for line in self:
+                lines.append(line)
+                if len(lines) >= lines_per_write:
+                    dest.write("".join(lines))
+                    lines.clear()
+        except (JSONLexError, JSONParseError):
+            # keep the lines produced before the error
+            dest.write("".join(lines))
+            raise
+        dest.write("".join(lines))
+
+    def _typed_value_tags(self) -> Dict[LexerToken, Callable]:
+        """
+        :return: the builders of the typed value tags, by token type
+        """
+        typed_text = self._typed_text
+        typed_empty = self._typed_empty
+        return {
+            LexerToken.STRING: lambda sp, k, v: (
+                typed_text(sp, k, "string", _escape_value(v)) if v
+                else typed_empty(sp, k, "string")),
+            LexerToken.BOOLEAN_VALUE: lambda sp, k, v: typed_text(
+                sp, k, "boolean", "true" if v else "false"),
+            LexerToken.NULL_VALUE: lambda sp, k, _v: typed_text(
+                sp, k, "null", "null"),
+            LexerToken.INT_VALUE: lambda sp, k, v: typed_text(
+                sp, k, "int", v),
+            LexerToken.FLOAT_VALUE: lambda sp, k, v: typed_text(
+                sp, k, "float", v),
+        }
+
+    def _plain_value_tags(self) -> Dict[LexerToken, Callable]:
+        """
+        :return: the builders of the value tags, by token type
+        """
+        text = self._text
+        empty = self._empty
+        return {
+            LexerToken.STRING: lambda sp, k, v: (
+                text(sp, k, _escape_value(v)) if v else empty(sp, k)),
+            LexerToken.BOOLEAN_VALUE: lambda sp, k, v: text(
+                sp, k, "true" if v else "false"),
+            LexerToken.NULL_VALUE: lambda sp, k, _v: text(sp, k, "null"),
+            LexerToken.INT_VALUE: text,
+            LexerToken.FLOAT_VALUE: text,
+        }
 
 
 def json2xml(source, dest, **kwargs):
@@ -757,8 +994,7 @@ def json2xml(source, dest, **kwargs):
     :param kwargs:
     :return:
     """
-    for line in JSONAsXML(source, **kwargs):
-        dest.write(line)
+    JSONAsXML(source, **kwargs).write_to(dest)
 
 
 def _get_parser() -> argparse.ArgumentParser:
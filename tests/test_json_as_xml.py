@@ -20,8 +20,10 @@
 import os
 import unittest
 from io import StringIO, BytesIO, TextIOWrapper
+from unittest import mock
 
-from json_event_parser import JSONAsXML, _escape_value, _escape_tag, json2xml
+from json_event_parser import (JSONAsXML, _escape_value, _escape_tag, json2xml,
+                               JSONLexError)
 
 
 class TestJSONAsXML(unittest.TestCase):
@@ -68,7 +70,10 @@ class TestJSONAsXML(unittest.TestCase):
         for tag, escaped_tag in [
             ("", '_'),
             ("&tag", "_tag"),
-            ("ta&g", "ta_g")
+            ("ta&g", "ta_g"),
+            ("1-t.g", "_-t.g"),
+            ("\u00e9t\u00e9 1", "\u00e9t\u00e9_1"),
+            ("\U0001F600", "_"),
         ]:
             self.assertEqual(escaped_tag, _escape_tag(tag))
 
@@ -84,6 +89,13 @@ class TestJSONAsXML(unittest.TestCase):
             "                                                            <a>1</a>",
             max(dest.getvalue().split("\n"), key=len))
 
+    def test_deep_tabs(self):
+        source = StringIO('{"a":' * 300 + '1' + '}' * 300)
+        dest = StringIO()
+        json2xml(source, dest, formatted=True)
+        self.assertEqual(300 * "    " + "<a>1</a>",
+                         max(dest.getvalue().split("\n"), key=len))
+
     def test_tab_None(self):
         source = StringIO(
             '{"a":{"a":{"a":{"a":{"a":{"a":{"a":{"a":{"a":{"a":{"a":{"a":{"a":{"a":{"a":1}}}}}}}}}}}}}}}')
@@ -120,6 +132,34 @@ class TestJSONAsXML(unittest.TestCase):
             '<?xml version="1.0" encoding="utf-8"?>\n<root><a type="float">1.5</a></root>',
             dest.getvalue())
 
+    def test_write_to(self):
+        source = StringIO('[1, 2, 3]')
+        dest = StringIO()
+        JSONAsXML(source, formatted=True).write_to(dest, 2)
+        self.assertEqual(
+            '<?xml version="1.0" encoding="utf-8"?>\n<root>\n'
+            '    <li>1</li>\n    <li>2</li>\n    <li>3</li>\n</root>\n',
+            dest.getvalue())
+
+    def test_write_to_error(self):
+        source = StringIO('[1, 2, 3, x]')
+        dest = StringIO()
+        with self.assertRaises(JSONLexError):
+            json2xml(source, dest)
+        self.assertEqual(
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<root><li>1</li><li>2</li><li>3</li>',
+            dest.getvalue())
+
+    def test_write_to_write_error(self):
+        source = StringIO('[1, 2, 3]')
+        dest = mock.Mock()
+        dest.write.side_effect = OSError("No space left on device")
+        with self.assertRaises(OSError) as e:
+            JSONAsXML(source).write_to(dest, 2)
+        self.assertEqual(1, dest.write.call_count)
+        self.assertIsNone(e.exception.__context__)
+
     def test_unicode(self):
         source = StringIO('{"a":"\\ud83d"}')
         dest = StringIO()
@@ -20,6 +20,7 @@
 import os
 import unittest
 from io import StringIO
+from unittest import mock
 
 from json_event_parser import JSONLexer, LexerToken, JSONLexError
 
@@ -58,12 +59,55 @@ class TestJSONLexer(unittest.TestCase):
         self.assertEqual("LexError: Unknown escaped char: `x` at 0:3",
                          str(e.exception))
 
+    def test_wrong_unicode(self):
+        for text, msg in [
+            ('"\\u00g1"', "LexError: Expected 4 hex digits, got: `00g1` at 0:7"),
+            ('"\\u+001"', "LexError: Expected 4 hex digits, got: `+001` at 0:7"),
+            ('"\\u00', "LexError: Expected 4 hex digits, got: `00` at 0:5"),
+        ]:
+            source = StringIO(text)
+            with self.assertRaises(JSONLexError) as e:
+                list(JSONLexer(source))
+
+            self.assertEqual(msg, str(e.exception))
+
+    def test_unicode_low_surrogate_error(self):
+        source = StringIO('"\\udf09"')
+        with self.assertRaises(JSONLexError) as e:
+            list(JSONLexer(source, ignore_unicode_errors=False))
+
+        self.assertEqual("LexError: Unexpected low surrogate: `57097` at 0:7",
+                         str(e.exception))
+
+    def test_unicode_missing_low_surrogate_error(self):
+        source = StringIO('"\\ud83dx"')
+        with self.assertRaises(JSONLexError) as e:
+            list(JSONLexer(source, ignore_unicode_errors=False))
+
+        self.assertEqual("LexError: Waiting for backslash, got : `x` at 0:8",
+                         str(e.exception))
+
     def test_zero_number(self):
         source = StringIO('01')
         self.assertEqual(
             [(LexerToken.INT_VALUE, "0"), (LexerToken.INT_VALUE, "1")],
             list(JSONLexer(source)))
 
+    def test_neg_zero_number(self):
+        source = StringIO('[-0, -0]')
+        self.assertEqual([(LexerToken.BEGIN_ARRAY, None),
+                          (LexerToken.INT_VALUE, "-0"),
+                          (LexerToken.VALUE_SEPARATOR, None),
+                          (LexerToken.INT_VALUE, "-0"),
+                          (LexerToken.END_ARRAY, None)],
+                         list(JSONLexer(source)))
+
+    def test_new_line_after_number(self):
+        source = StringIO('12\n34\n')
+        self.assertEqual(
+            [(LexerToken.INT_VALUE, "12"), (LexerToken.INT_VALUE, "34")],
+            list(JSONLexer(source)))
+
     def test_missing_decimals(self):
         source = StringIO('0.')
         with self.assertRaises(JSONLexError) as e:
@@ -172,6 +216,15 @@ class TestJSONLexer(unittest.TestCase):
         self.assertEqual([(LexerToken.FLOAT_VALUE, '10.5e-3')],
                          list(JSONLexer(source)))
 
+    def test_exp_plus(self):
+        for number, expected in [
+            ('10.5E+3', '10.5e+3'),
+            ('[1e+53]', '1e+53'),
+        ]:
+            source = StringIO(number)
+            self.assertIn((LexerToken.FLOAT_VALUE, expected),
+                          list(JSONLexer(source)))
+
     def test_neg_err(self):
         for number, msg in [
             ('-a', "LexError: Expected digit, got `a` at 0:2"),
@@ -184,9 +237,10 @@ class TestJSONLexer(unittest.TestCase):
 
     def test_float_errs(self):
         for number, msg in [
-            ('10.5e-3.8', "LexError: Unexpected char `.` at 0:9"),
+            ('10.5e-3.8', "LexError: Unexpected char `.` at 0:8"),
             ('10.5e-', "LexError: Missing exp `10.5e-` at 0:6"),
-            ('10.5e', "LexError: Missing exp `10.5e` at 0:5")
+            ('10.5e', "LexError: Missing exp `10.5e` at 0:5"),
+            ('10.5e+', "LexError: Missing exp `10.5e+` at 0:6"),
         ]:
             source = StringIO(number)
             with self.assertRaises(JSONLexError) as e:
@@ -212,9 +266,9 @@ class TestJSONLexer(unittest.TestCase):
 
     def test_word_errs(self):
         for word, msg in [
-            ("foo", "LexError: Expected `false` at 0:1"),
-            ("too", "LexError: Expected `true` at 0:1"),
-            ("noo", "LexError: Expected `null` at 0:1"),
+            ("foo", "LexError: Expected `false` at 0:3"),
+            ("too", "LexError: Expected `true` at 0:3"),
+            ("noo", "LexError: Expected `null` at 0:3"),
             ("zoo", "LexError: Unexpected char `z` at 0:1")
         ]:
             source = StringIO(word)
@@ -256,6 +310,85 @@ class TestJSONLexer(unittest.TestCase):
             (LexerToken.END_ARRAY, None),
             (LexerToken.END_OBJECT, None)], list(JSONLexer(source)))
 
+    def test_small_blocks(self):
+        source = StringIO('[true, -10.5e3, "a\\u0062c", null, false]')
+        with mock.patch("json_event_parser._BUFFER_SIZE", 2):
+            tokens = list(JSONLexer(source))
+
+        self.assertEqual([(LexerToken.BEGIN_ARRAY, None),
+                          (LexerToken.BOOLEAN_VALUE, True),
+                          (LexerToken.VALUE_SEPARATOR, None),
+                          (LexerToken.FLOAT_VALUE, '-10.5e3'),
+                          (LexerToken.VALUE_SEPARATOR, None),
+                          (LexerToken.STRING, 'abc'),
+                          (LexerToken.VALUE_SEPARATOR, None),
+                          (LexerToken.NULL_VALUE, None),
+                          (LexerToken.VALUE_SEPARATOR, None),
+                          (LexerToken.BOOLEAN_VALUE, False),
+                          (LexerToken.END_ARRAY, None)], tokens)
+
+    def test_from_bytes(self):
+        for data in (b'["\xc3\xa9", 1]', bytearray(b'["\xc3\xa9", 1]'),
+                     memoryview(b'["\xc3\xa9", 1]')):
+            self.assertEqual([(LexerToken.BEGIN_ARRAY, None),
+                              (LexerToken.STRING, '\xe9'),
+                              (LexerToken.VALUE_SEPARATOR, None),
+                              (LexerToken.INT_VALUE, '1'),
+                              (LexerToken.END_ARRAY, None)],
+                             list(JSONLexer.from_bytes(data)))
+
+    def test_from_bytes_encoding(self):
+        self.assertEqual([(LexerToken.STRING, '\xe9')],
+                         list(JSONLexer.from_bytes(b'"\xe9"', "latin-1")))
+
+    def test_position_per_token(self):
+        expected = [(0, 1), (0, 4), (0, 5), (0, 7), (0, 8), (0, 9),
+                    (1, 6), (1, 7), (1, 14), (1, 15), (1, 16),
+                    (2, 4), (2, 5), (3, 6), (4, 1)]
+        for block_size in (1, 2, 3, 65536):
+            source = StringIO('{"a": [1,\n  true, "x\\ny"],\n "b":\n  -2.5\n}')
+            with mock.patch("json_event_parser._BUFFER_SIZE", block_size):
+                lexer = JSONLexer(source)
+                positions = [(lexer.line, lexer.column) for _ in lexer]
+
+            self.assertEqual(expected, positions)
+
+    def test_error_position_small_blocks(self):
+        for block_size in (1, 2, 3, 65536):
+            source = StringIO('[1,\n  true,\n  x]')
+            with mock.patch("json_event_parser._BUFFER_SIZE", block_size):
+                with self.assertRaises(JSONLexError) as e:
+                    list(JSONLexer(source))
+
+            self.assertEqual("LexError: Unexpected char `x` at 2:3",
+                             str(e.exception))
+
+    def test_next_token(self):
+        lexer = JSONLexer(StringIO('[1, "a"]'))
+        self.assertEqual((LexerToken.BEGIN_ARRAY, None), lexer.next_token())
+        self.assertEqual((LexerToken.INT_VALUE, "1"), lexer.next_token())
+        self.assertEqual((LexerToken.VALUE_SEPARATOR, None),
+                         lexer.next_token())
+        self.assertEqual((LexerToken.STRING, "a"), lexer.next_token())
+        self.assertEqual((LexerToken.END_ARRAY, None), lexer.next_token())
+        self.assertIsNone(lexer.next_token())
+        self.assertIsNone(lexer.next_token())
+
+    def test_next_token_and_iter(self):
+        lexer = JSONLexer(StringIO('[1,\n 2,\n x]'))
+        self.assertEqual((LexerToken.BEGIN_ARRAY, None), lexer.next_token())
+        self.assertEqual((LexerToken.INT_VALUE, "1"), next(iter(lexer)))
+        tokens = []
+        with self.assertRaises(JSONLexError) as e:
+            for token in lexer:
+                tokens.append(token)
+        self.assertEqual([(LexerToken.VALUE_SEPARATOR, None),
+                          (LexerToken.INT_VALUE, "2"),
+                          (LexerToken.VALUE_SEPARATOR, None)], tokens)
+        self.assertEqual("LexError: Unexpected char `x` at 2:2",
+                         str(e.exception))
+        self.assertIsNone(lexer.next_token())
+
     def test_example1(self):
         with open(
                 os.path.join(os.path.dirname(__file__), "files/example1.json"),
@@ -107,7 +107,7 @@ class TestJSONParser(unittest.TestCase):
             list(JSONParser(source))
 
         self.assertEqual(
-            "ParseError: Unexpected token `(<LexerToken.INT_VALUE: 4>, '1')` as object member at 3:0",
+            "ParseError: Unexpected token `(<LexerToken.INT_VALUE: 4>, '1')` as object member at 2:0",
             str(e.exception))
 
     def test_missing_comma(self):
@@ -117,7 +117,7 @@ class TestJSONParser(unittest.TestCase):
             list(JSONParser(source))
 
         self.assertEqual(
-            "ParseError: Unexpected token `(<LexerToken.INT_VALUE: 4>, '4')` in array, expected `LexerToken.VALUE_SEPARATOR` at 6:0",
+            "ParseError: Unexpected token `(<LexerToken.INT_VALUE: 4>, '4')` in array, expected `LexerToken.VALUE_SEPARATOR` at 4:0",
             str(e.exception))
 
     def test_missing_sep(self):
@@ -127,7 +127,7 @@ class TestJSONParser(unittest.TestCase):
             list(JSONParser(source))
 
         self.assertEqual(
-            "ParseError: Unexpected token `(<LexerToken.INT_VALUE: 4>, '4')`, expected LexerToken.NAME_SEPARATOR at 7:0",
+            "ParseError: Unexpected token `(<LexerToken.INT_VALUE: 4>, '4')`, expected LexerToken.NAME_SEPARATOR at 6:0",
             str(e.exception))
 
     def test_missing_value(self):
@@ -147,7 +147,7 @@ class TestJSONParser(unittest.TestCase):
             list(JSONParser(source))
 
         self.assertEqual(
-            "ParseError: Unexpected token `(<LexerToken.STRING: 3>, 'b')` in object at 12:0",
+            "ParseError: Unexpected token `(<LexerToken.STRING: 3>, 'b')` in object at 11:0",
             str(e.exception))
 
     def test_missing_sep2(self):
@@ -157,7 +157,7 @@ class TestJSONParser(unittest.TestCase):
             list(JSONParser(source))
 
         self.assertEqual(
-            "ParseError: Unexpected token `(<LexerToken.INT_VALUE: 4>, '1')`, expected LexerToken.NAME_SEPARATOR at 7:0",
+            "ParseError: Unexpected token `(<LexerToken.INT_VALUE: 4>, '1')`, expected LexerToken.NAME_SEPARATOR at 6:0",
             str(e.exception))
 
     def test_close(self):